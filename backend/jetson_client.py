@@ -5,32 +5,127 @@ Sends detection data to the backend server
 This script should be run on the Jetson Nano device
 """
 
+import gzip
+import msgpack
+import numpy as np
 import requests
+import socket
 import time
 import json
 from datetime import datetime
-import random  # For demo purposes - replace with actual detection
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Optional: httpx multiplexes requests over one HTTP/2 connection (pip install httpx[http2])
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
 
 # Configuration
 SERVER_URL = "http://localhost:5000"  # Change to your server IP
 DEVICE_ID = "JETSON-001"
+COMPRESS_MIN_BYTES = 512  # Only gzip bodies larger than this; small status pings aren't worth it
+RANDOM_BATCH = 64  # Demo loop draws its random values this many iterations at a time
+STATUS_KEYFRAME_INTERVAL = 30  # Send the full status every Nth update so the server can resync
+
+# Minimum change before a numeric status field is re-sent
+STATUS_DELTA_THRESHOLDS = {
+    "temperature": 0.5,
+    "cpuUsage": 1,
+    "memoryUsage": 1,
+    "signalStrength": 1,
+    "latitude": 0.0001,
+    "longitude": 0.0001,
+    "vehicleSpeed": 1,
+    "inferenceRate": 1
+}
+
+
+class NoDelayAdapter(HTTPAdapter):
+    """HTTPAdapter that disables Nagle and enables TCP keep-alive on pooled sockets"""
+    
+    SOCKET_OPTIONS = [
+        (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    ]
+    
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = self.SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
 
 class PotholeDetectionClient:
     def __init__(self, server_url, device_id):
         self.server_url = server_url
         self.device_id = device_id
         
+        # Prefer HTTP/2 so status and detection uploads share one multiplexed
+        # connection with HPACK-compressed headers
+        self.client = None
+        if HTTPX_AVAILABLE:
+            try:
+                self.client = httpx.Client(
+                    base_url=server_url,
+                    timeout=10,
+                    transport=httpx.HTTPTransport(
+                        http2=True,
+                        retries=2,
+                        limits=httpx.Limits(max_keepalive_connections=4,
+                                            keepalive_expiry=30),
+                        socket_options=NoDelayAdapter.SOCKET_OPTIONS
+                    )
+                )
+            except ImportError as e:  # http2=True needs the h2 package
+                print(f"HTTP/2 unavailable ({e}), using requests")
+        
+        # Fallback: reuse one pooled keep-alive connection instead of a new
+        # TCP/TLS handshake per request
+        self.session = None
+        if self.client is None:
+            self.session = requests.Session()
+            adapter = NoDelayAdapter(
+                pool_connections=4,
+                pool_maxsize=8,
+                max_retries=Retry(total=2, backoff_factor=0.3)
+            )
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+            self.session.headers.update({'Connection': 'keep-alive'})
+        
+        # Detections waiting to be flushed with the next batch
+        self._pending_detections = self._empty_detection_columns()
+        
+        # Last status values sent, for delta encoding
+        self._last_status = {}
+        self._status_seq = 0
+        
+    def _post(self, path, payload=None, timeout=10):
+        """POST a MessagePack-encoded payload on the shared connection"""
+        if payload is None:
+            # Bodyless requests (heartbeats) carry no Content-Type
+            body, headers = None, None
+        else:
+            body = msgpack.packb(payload, use_bin_type=True)
+            headers = {'Content-Type': 'application/msgpack'}
+            if len(body) > COMPRESS_MIN_BYTES:
+                # Batches repeat the same field names per detection and compress well;
+                # the backend's body parser inflates gzip transparently
+                body = gzip.compress(body, compresslevel=3)
+                headers['Content-Encoding'] = 'gzip'
+        if self.client is not None:
+            return self.client.post(path, content=body, headers=headers, timeout=timeout)
+        return self.session.post(f"{self.server_url}{path}", data=body, headers=headers,
+                                 timeout=timeout)
+    
     def send_detection(self, detection_data):
         """Send pothole detection to backend"""
         try:
-            response = requests.post(
-                f"{self.server_url}/api/detections",
-                json={
-                    "deviceId": self.device_id,
-                    **detection_data
-                },
-                timeout=10
-            )
+            response = self._post("/api/detections", {
+                "deviceId": self.device_id,
+                **detection_data
+            })
             if response.status_code == 201:
                 print(f"Detection sent successfully: {response.json()['data']['detectionId']}")
                 return True
@@ -41,44 +136,135 @@ class PotholeDetectionClient:
             print(f"Error sending detection: {e}")
             return False
     
+    @staticmethod
+    def build_status(temperature, cpu_usage, memory_usage,
+                     signal_strength, latitude, longitude,
+                     vehicle_speed=0, inference_rate=30):
+        """Build a device status record"""
+        return {
+            "temperature": temperature,
+            "cpuUsage": cpu_usage,
+            "memoryUsage": memory_usage,
+            "signalStrength": signal_strength,
+            "mpuStatus": "Active",
+            "cameraStatus": "Active",
+            "gpsStatus": "Active",
+            "latitude": latitude,
+            "longitude": longitude,
+            "vehicleSpeed": vehicle_speed,
+            "inferenceRate": inference_rate
+        }
+    
+    def _encode_status(self, status):
+        """Delta-encode a status record against the last one sent.
+        
+        Only fields that moved past their threshold are included, except on
+        every STATUS_KEYFRAME_INTERVAL-th update, which carries all fields.
+        """
+        keyframe = self._status_seq % STATUS_KEYFRAME_INTERVAL == 0 or not self._last_status
+        delta = {}
+        for key, value in status.items():
+            last = self._last_status.get(key)
+            threshold = STATUS_DELTA_THRESHOLDS.get(key)
+            if keyframe or last is None:
+                changed = True
+            elif threshold is not None:
+                changed = abs(value - last) >= threshold
+            else:
+                changed = value != last
+            if changed:
+                delta[key] = value
+        
+        self._last_status.update(delta)
+        encoded = {"seq": self._status_seq, "delta": delta}
+        if keyframe:
+            encoded["keyframe"] = True
+        self._status_seq += 1
+        return encoded
+    
     def send_device_status(self, temperature, cpu_usage, memory_usage, 
                            signal_strength, latitude, longitude, 
                            vehicle_speed=0, inference_rate=30):
-        """Send device status update"""
+        """Send device status update (only the fields that changed)"""
         try:
-            response = requests.post(
-                f"{self.server_url}/api/devices/status",
-                json={
-                    "deviceId": self.device_id,
-                    "temperature": temperature,
-                    "cpuUsage": cpu_usage,
-                    "memoryUsage": memory_usage,
-                    "signalStrength": signal_strength,
-                    "mpuStatus": "Active",
-                    "cameraStatus": "Active",
-                    "gpsStatus": "Active",
-                    "latitude": latitude,
-                    "longitude": longitude,
-                    "vehicleSpeed": vehicle_speed,
-                    "inferenceRate": inference_rate
-                },
-                timeout=10
-            )
+            response = self._post("/api/devices/status", {
+                "deviceId": self.device_id,
+                **self._encode_status(self.build_status(
+                    temperature, cpu_usage, memory_usage,
+                    signal_strength, latitude, longitude,
+                    vehicle_speed, inference_rate))
+            })
             if response.status_code == 200:
                 print("Device status updated")
                 return True
+            self._last_status.clear()  # Force a full resync on the next update
             return False
         except Exception as e:
             print(f"Error sending status: {e}")
+            self._last_status.clear()
             return False
     
+    @staticmethod
+    def _empty_detection_columns():
+        """Column-oriented detection batch: field names are sent once, not per record"""
+        return {
+            "type": [], "severity": [], "conf": [], "location": [],
+            "lat": [], "lon": [],
+            "bb": {"x": [], "y": [], "w": [], "h": []}
+        }
+    
+    def queue_detection(self, det_type, severity, confidence, location,
+                        latitude, longitude, bounding_box):
+        """Queue a detection; it goes out with the next send_batch() call
+        
+        bounding_box is an (x, y, width, height) tuple in percent of the frame.
+        """
+        cols = self._pending_detections
+        cols["type"].append(det_type)
+        cols["severity"].append(severity)
+        cols["conf"].append(confidence)
+        cols["location"].append(location)
+        cols["lat"].append(latitude)
+        cols["lon"].append(longitude)
+        bb = cols["bb"]
+        x, y, w, h = bounding_box
+        bb["x"].append(x)
+        bb["y"].append(y)
+        bb["w"].append(w)
+        bb["h"].append(h)
+    
+    def send_batch(self, status=None, detections=None):
+        """Send device status and detections in a single request.
+        
+        Flushes the queued detections when none are given explicitly
+        (detections may also be passed as a list of per-record dicts).
+        Returns the number of detections stored by the server, or None on failure.
+        """
+        if detections is None and self._pending_detections["type"]:
+            detections = self._pending_detections
+            self._pending_detections = self._empty_detection_columns()
+        payload = {"deviceId": self.device_id}
+        if detections:
+            payload["detections"] = detections
+        if status is not None:
+            payload["status"] = self._encode_status(status)
+        try:
+            response = self._post("/api/batch", payload)
+            if response.status_code == 201:
+                stored = len(response.json()['data']['detectionIds'])
+                print(f"Batch sent: status={'yes' if status else 'no'}, detections={stored}")
+                return stored
+            print(f"Failed to send batch: {response.status_code}")
+        except Exception as e:
+            print(f"Error sending batch: {e}")
+        if status is not None:
+            self._last_status.clear()  # Force a full resync on the next update
+        return None
+    
     def send_heartbeat(self):
         """Send heartbeat to keep device online"""
         try:
-            response = requests.post(
-                f"{self.server_url}/api/devices/{self.device_id}/heartbeat",
-                timeout=5
-            )
+            response = self._post(f"/api/devices/{self.device_id}/heartbeat", timeout=5)
             return response.status_code == 200
         except Exception as e:
             print(f"Heartbeat failed: {e}")
@@ -119,49 +305,71 @@ def demo_detection_loop():
     print(f"Device ID: {DEVICE_ID}")
     print("-" * 50)
     
+    severities = ["low", "medium", "high"]
+    
+    # Inclusive integer ranges for every random integer the loop needs:
+    # temperature, cpu, memory, signal, speed, inference rate, bbox x/y/w/h,
+    # sleep seconds, location index, severity index, detection type index
+    int_low = [45, 40, 30, 70, 20, 25, 10, 40, 10, 8, 3, 0, 0, 0]
+    int_high = [65, 85, 60, 95, 60, 35, 60, 70, 25, 15, 8,
+                len(locations) - 1, len(severities) - 1, len(detection_types) - 1]
+    # Float ranges: status lat/lon jitter, detection chance, confidence, detection lat/lon jitter
+    float_low = [-0.01, -0.01, 0.0, 75, -0.001, -0.001]
+    float_high = [0.01, 0.01, 1.0, 98, 0.001, 0.001]
+    
+    rng = np.random.default_rng()
+    row = RANDOM_BATCH
     detection_count = 0
     
     while True:
         try:
-            # Send device status every iteration
-            client.send_device_status(
-                temperature=random.randint(45, 65),
-                cpu_usage=random.randint(40, 85),
-                memory_usage=random.randint(30, 60),
-                signal_strength=random.randint(70, 95),
-                latitude=28.6139 + random.uniform(-0.01, 0.01),
-                longitude=77.2090 + random.uniform(-0.01, 0.01),
-                vehicle_speed=random.randint(20, 60),
-                inference_rate=random.randint(25, 35)
+            if row == RANDOM_BATCH:
+                # One vectorized draw covers the next RANDOM_BATCH iterations
+                ints = rng.integers(int_low, int_high, size=(RANDOM_BATCH, len(int_low)),
+                                    endpoint=True).tolist()
+                floats = rng.uniform(float_low, float_high,
+                                     size=(RANDOM_BATCH, len(float_low))).tolist()
+                row = 0
+            (temperature, cpu_usage, memory_usage, signal_strength, vehicle_speed,
+             inference_rate, bb_x, bb_y, bb_w, bb_h, delay,
+             location_idx, severity_idx, type_idx) = ints[row]
+            lat_jitter, lon_jitter, chance, confidence, det_lat_jitter, det_lon_jitter = floats[row]
+            row += 1
+            
+            # Device status piggybacks on every batch
+            status = client.build_status(
+                temperature=temperature,
+                cpu_usage=cpu_usage,
+                memory_usage=memory_usage,
+                signal_strength=signal_strength,
+                latitude=28.6139 + lat_jitter,
+                longitude=77.2090 + lon_jitter,
+                vehicle_speed=vehicle_speed,
+                inference_rate=inference_rate
             )
             
             # Simulate random detection (every 5-15 seconds)
-            if random.random() > 0.7:  # 30% chance of detection
-                location = random.choice(locations)
-                severity = random.choice(["low", "medium", "high"])
-                det_type = random.choice(detection_types)
+            if chance > 0.7:  # 30% chance of detection
+                location = locations[location_idx]
                 
-                detection_data = {
-                    "type": det_type,
-                    "severity": severity,
-                    "confidence": random.uniform(75, 98),
-                    "location": location[0],
-                    "latitude": location[1] + random.uniform(-0.001, 0.001),
-                    "longitude": location[2] + random.uniform(-0.001, 0.001),
-                    "boundingBox": {
-                        "x": random.randint(10, 60),
-                        "y": random.randint(40, 70),
-                        "width": random.randint(10, 25),
-                        "height": random.randint(8, 15)
-                    }
-                }
-                
-                if client.send_detection(detection_data):
-                    detection_count += 1
-                    print(f"Total detections sent: {detection_count}")
+                client.queue_detection(
+                    det_type=detection_types[type_idx],
+                    severity=severities[severity_idx],
+                    confidence=confidence,
+                    location=location[0],
+                    latitude=location[1] + det_lat_jitter,
+                    longitude=location[2] + det_lon_jitter,
+                    bounding_box=(bb_x, bb_y, bb_w, bb_h)
+                )
+            
+            # One request per tick: status plus whatever detections are queued
+            stored = client.send_batch(status)
+            if stored:
+                detection_count += stored
+                print(f"Total detections sent: {detection_count}")
             
             # Wait before next iteration
-            time.sleep(random.randint(3, 8))
+            time.sleep(delay)
             
         except KeyboardInterrupt:
             print("\nStopping detection client...")
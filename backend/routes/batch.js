@@ -0,0 +1,126 @@
+const express = require('express');
+const router = express.Router();
+const PotholeDetection = require('../models/PotholeDetection');
+const { v4: uuidv4 } = require('uuid');
+const { applyDeviceStatus } = require('../utils/deviceStatus');
+const { TYPE_MAPPING } = require('../utils/detectionTypes');
+
+// Detections may arrive column-oriented, e.g.
+//   { type: [...], severity: [...], conf: [...], location: [...], lat: [...], lon: [...],
+//     timestamp: [...], bb: { x: [...], y: [...], w: [...], h: [...] } }
+// so field names are sent once per batch instead of once per record.
+// A plain array of detection objects is accepted as well.
+const toDetectionRows = (detections) => {
+  if (Array.isArray(detections)) return detections;
+
+  const {
+    type = [],
+    severity = [],
+    conf = [],
+    location = [],
+    lat = [],
+    lon = [],
+    timestamp = [],
+    bb
+  } = detections;
+
+  return type.map((t, i) => ({
+    type: t,
+    severity: severity[i],
+    confidence: conf[i],
+    location: location[i],
+    latitude: lat[i],
+    longitude: lon[i],
+    timestamp: timestamp[i],
+    boundingBox: bb ? { x: bb.x[i], y: bb.y[i], width: bb.w[i], height: bb.h[i] } : undefined
+  }));
+};
+
+// @route   POST /api/batch
+// @desc    Receive device status and queued detections from Jetson Nano in one request
+// @access  Public (should be secured in production)
+router.post('/', async (req, res) => {
+  try {
+    const { deviceId, status } = req.body;
+    const detections = toDetectionRows(req.body.detections || []);
+
+    if (!deviceId) {
+      return res.status(400).json({
+        success: false,
+        message: 'Missing required field: deviceId'
+      });
+    }
+
+    const io = req.app.get('io');
+    let device = null;
+
+    // Piggybacked device status
+    if (status) {
+      device = await applyDeviceStatus(deviceId, status);
+
+      if (io) {
+        io.emit('deviceStatus', device);
+      }
+    }
+
+    // Queued detections, stored with a single insert
+    const records = detections
+      .filter(det => det.type && (det.confidence || det.confidence === 0))
+      .map(det => {
+        const { latitude, longitude } = det;
+        return {
+          detectionId: `DET-${Date.now()}-${uuidv4().substring(0, 8)}`,
+          deviceId,
+          type: TYPE_MAPPING[det.type] || det.type,
+          severity: det.severity || 'medium',
+          confidence: det.confidence,
+          location: det.location ||
+            (latitude && longitude ? `GPS: ${latitude.toFixed(4)}, ${longitude.toFixed(4)}` : null),
+          gps: {
+            latitude: latitude || null,
+            longitude: longitude || null
+          },
+          boundingBox: det.boundingBox,
+          forwarded: false,
+          detectedAt: det.timestamp ? new Date(det.timestamp) : new Date()
+        };
+      });
+
+    // Unordered insert: a record failing schema validation is skipped instead of
+    // failing the whole batch. Per-record outcomes are documents or errors.
+    const outcomes = records.length > 0
+      ? (await PotholeDetection.insertMany(records, { ordered: false, rawResult: true })).mongoose.results
+      : [];
+    const saved = outcomes.filter(outcome => !(outcome instanceof Error));
+    const invalid = outcomes.filter(outcome => outcome instanceof Error);
+
+    if (invalid.length > 0) {
+      console.warn(`Batch from ${deviceId}: ${invalid.length} invalid detection(s) skipped`);
+    }
+
+    if (io) {
+      saved.forEach(detection => io.emit('newDetection', detection.toObject()));
+    }
+
+    res.status(201).json({
+      success: true,
+      message: 'Batch recorded successfully',
+      data: {
+        detectionIds: saved.map(d => d.detectionId),
+        skipped: detections.length - saved.length,
+        errors: invalid.map(err => err.message),
+        statusUpdated: Boolean(device)
+      }
+    });
+
+  } catch (error) {
+    console.error('Error saving batch:', error);
+    res.status(500).json({
+      success: false,
+      message: 'Error recording batch',
+      error: error.message
+    });
+  }
+});
+
+module.exports = router;
@@ -3,16 +3,7 @@ const router = express.Router();
 const PotholeDetection = require('../models/PotholeDetection');
 const RepairTicket = require('../models/RepairTicket');
 const { v4: uuidv4 } = require('uuid');
-
-// Type mapping for handling different client formats
-const TYPE_MAPPING = {
-  'Pothole': 'Severe Pothole',
-  'pothole': 'Severe Pothole',
-  'Crack': 'Asphalt Crack',
-  'crack': 'Asphalt Crack',
-  'Damage': 'Surface Damage',
-  'damage': 'Surface Damage'
-};
+const { TYPE_MAPPING } = require('../utils/detectionTypes');
 
 // Helper to generate ticket ID
 const generateTicketId = () => {
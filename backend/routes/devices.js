@@ -1,60 +1,17 @@
 const express = require('express');
 const router = express.Router();
 const DeviceStatus = require('../models/DeviceStatus');
+const { applyDeviceStatus } = require('../utils/deviceStatus');
 
 // @route   POST /api/devices/status
 // @desc    Update device status from Jetson Nano
 // @access  Public
 router.post('/status', async (req, res) => {
   try {
-    const {
-      deviceId,
-      temperature,
-      cpuUsage,
-      memoryUsage,
-      signalStrength,
-      networkType,
-      mpuStatus,
-      cameraStatus,
-      gpsStatus,
-      latitude,
-      longitude,
-      address,
-      vehicleSpeed,
-      inferenceRate
-    } = req.body;
-    
-    // Find or create device status
-    let device = await DeviceStatus.findOne({ deviceId });
-    
-    if (!device) {
-      device = new DeviceStatus({ deviceId });
-    }
-    
-    // Update fields
-    if (temperature !== undefined) device.temperature = temperature;
-    if (cpuUsage !== undefined) device.cpuUsage = cpuUsage;
-    if (memoryUsage !== undefined) device.memoryUsage = memoryUsage;
-    if (signalStrength !== undefined) device.signalStrength = signalStrength;
-    if (networkType !== undefined) device.networkType = networkType;
-    if (mpuStatus !== undefined) device.mpuStatus = mpuStatus;
-    if (cameraStatus !== undefined) device.cameraStatus = cameraStatus;
-    if (gpsStatus !== undefined) device.gpsStatus = gpsStatus;
-    if (vehicleSpeed !== undefined) device.vehicleSpeed = vehicleSpeed;
-    if (inferenceRate !== undefined) device.inferenceRate = inferenceRate;
-    
-    if (latitude !== undefined && longitude !== undefined) {
-      device.currentLocation = {
-        latitude,
-        longitude,
-        address: address || device.currentLocation?.address
-      };
-    }
-    
-    device.isOnline = true;
-    device.lastSeen = new Date();
-    
-    await device.save();
+    const { deviceId } = req.body;
+
+    // Accepts a full status record or a delta-encoded one ({ seq, delta })
+    const device = await applyDeviceStatus(deviceId, req.body);
     
     // Emit real-time update
     if (req.app.get('io')) {
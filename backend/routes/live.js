@@ -1,5 +1,6 @@
 const express = require('express');
 const router = express.Router();
+const { applyDeviceStatus } = require('../utils/deviceStatus');
 
 // In-memory storage for live stream data (shared with server.js via app context)
 // This route provides HTTP endpoints for accessing live stream data
@@ -86,6 +87,7 @@ router.post('/stream', async (req, res) => {
       detections,
       gps,
       stats,
+      status,
       timestamp
     } = req.body;
 
@@ -93,10 +95,13 @@ router.post('/stream', async (req, res) => {
     const latestFrames = req.app.get('latestFrames') || new Map();
     const activeDevices = req.app.get('activeDevices') || new Map();
 
-    // Store latest frame
+    // Store latest frame (raw JPEG bytes from msgpack bodies decode to a
+    // Uint8Array and are re-encoded for dashboards)
     const streamData = {
       deviceId,
-      frame,
+      frame: frame instanceof Uint8Array
+        ? Buffer.from(frame.buffer, frame.byteOffset, frame.byteLength).toString('base64')
+        : frame,
       detections: detections || [],
       gps: gps || {},
       stats: stats || {},
@@ -134,12 +139,25 @@ router.post('/stream', async (req, res) => {
       }
     }
 
+    // Respond once relayed so the sender can pace itself (before the slower DB write)
     res.json({
       success: true,
       message: 'Stream data received',
       detectionCount: detections ? detections.length : 0
     });
 
+    // Device status piggybacked on the stream every few seconds
+    if (status) {
+      try {
+        const device = await applyDeviceStatus(deviceId, status);
+        if (io) {
+          io.emit('deviceStatus', device);
+        }
+      } catch (err) {
+        console.error(`❌ Failed to update device status: ${err.message}`);
+      }
+    }
+
   } catch (error) {
     console.error('Error processing live stream:', error);
     res.status(500).json({
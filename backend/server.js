@@ -5,12 +5,15 @@ const http = require('http');
 const cors = require('cors');
 const { Server } = require('socket.io');
 const connectDB = require('./config/db');
+const { msgpackParser } = require('./utils/msgpack');
+const { applyDeviceStatus } = require('./utils/deviceStatus');
 
 // Route imports
 const detectionRoutes = require('./routes/detections');
 const ticketRoutes = require('./routes/tickets');
 const deviceRoutes = require('./routes/devices');
 const liveRoutes = require('./routes/live');
+const batchRoutes = require('./routes/batch');
 
 // Model imports
 const PotholeDetection = require('./models/PotholeDetection');
@@ -58,6 +61,7 @@ app.use(cors({
   credentials: true
 }));
 app.use(express.json({ limit: '50mb' })); // Large limit for image data
+app.use(msgpackParser({ limit: '50mb' })); // Compact binary bodies from edge clients
 app.use(express.urlencoded({ extended: true }));
 
 // Request logging middleware
@@ -71,6 +75,7 @@ app.use('/api/detections', detectionRoutes);
 app.use('/api/tickets', ticketRoutes);
 app.use('/api/devices', deviceRoutes);
 app.use('/api/live', liveRoutes);
+app.use('/api/batch', batchRoutes);
 
 // Health check endpoint
 app.get('/api/health', (req, res) => {
@@ -93,7 +98,8 @@ app.get('/', (req, res) => {
       detections: '/api/detections',
       tickets: '/api/tickets',
       devices: '/api/devices',
-      live: '/api/live'
+      live: '/api/live',
+      batch: '/api/batch'
     }
   });
 });
@@ -144,10 +150,15 @@ io.on('connection', (socket) => {
   });
 
   // Handle live stream from Jetson Nano (with video frame) - LEGACY SUPPORT
-  socket.on('liveStream', async (data) => {
+  socket.on('liveStream', async (data, ack) => {
     const deviceId = data.deviceId || socket.deviceId;
     console.log(`📹 Received liveStream from Jetson "${deviceId}"`);
 
+    // Edge clients send raw JPEG bytes; dashboards expect base64
+    if (Buffer.isBuffer(data.frame)) {
+      data.frame = data.frame.toString('base64');
+    }
+
     // Update device last seen
     if (activeDevices.has(deviceId)) {
       activeDevices.get(deviceId).lastSeen = new Date();
@@ -164,6 +175,24 @@ io.on('connection', (socket) => {
     
     // ALSO broadcast to all frontend clients for immediate visibility
     io.emit('stream', data);
+
+    // Ack once relayed so the sender can pace itself (before the slower DB writes)
+    if (typeof ack === 'function') {
+      ack({ received: true });
+    }
+
+    // 📊 Device status rides along with a frame every few seconds
+    if (data.status) {
+      if (activeDevices.has(deviceId)) {
+        activeDevices.get(deviceId).status = data.status;
+      }
+      try {
+        const device = await applyDeviceStatus(deviceId, data.status);
+        io.emit('deviceStatus', device);
+      } catch (err) {
+        console.error(`❌ Failed to update device status: ${err.message}`);
+      }
+    }
     
     // 💾 Save detections to MongoDB if any are found
     if (data.detections && data.detections.length > 0) {
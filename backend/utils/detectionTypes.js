@@ -0,0 +1,12 @@
+// Type mapping for handling different client formats
+// (edge clients send short class names, the dashboard uses display names)
+const TYPE_MAPPING = {
+  'Pothole': 'Severe Pothole',
+  'pothole': 'Severe Pothole',
+  'Crack': 'Asphalt Crack',
+  'crack': 'Asphalt Crack',
+  'Damage': 'Surface Damage',
+  'damage': 'Surface Damage'
+};
+
+module.exports = { TYPE_MAPPING };
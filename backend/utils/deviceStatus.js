@@ -0,0 +1,56 @@
+const DeviceStatus = require('../models/DeviceStatus');
+
+// Apply a status report from an edge device to its DeviceStatus record.
+// Accepts a full status record or a delta-encoded one ({ seq, delta }) and
+// returns the saved document.
+const applyDeviceStatus = async (deviceId, status) => {
+  let device = await DeviceStatus.findOne({ deviceId });
+
+  if (!device) {
+    device = new DeviceStatus({ deviceId });
+  }
+
+  const {
+    temperature,
+    cpuUsage,
+    memoryUsage,
+    signalStrength,
+    networkType,
+    mpuStatus,
+    cameraStatus,
+    gpsStatus,
+    latitude,
+    longitude,
+    address,
+    vehicleSpeed,
+    inferenceRate
+  } = status.delta || status;
+
+  if (temperature !== undefined) device.temperature = temperature;
+  if (cpuUsage !== undefined) device.cpuUsage = cpuUsage;
+  if (memoryUsage !== undefined) device.memoryUsage = memoryUsage;
+  if (signalStrength !== undefined) device.signalStrength = signalStrength;
+  if (networkType !== undefined) device.networkType = networkType;
+  if (mpuStatus !== undefined) device.mpuStatus = mpuStatus;
+  if (cameraStatus !== undefined) device.cameraStatus = cameraStatus;
+  if (gpsStatus !== undefined) device.gpsStatus = gpsStatus;
+  if (vehicleSpeed !== undefined) device.vehicleSpeed = vehicleSpeed;
+  if (inferenceRate !== undefined) device.inferenceRate = inferenceRate;
+
+  // Delta updates may carry only one coordinate
+  if (latitude !== undefined || longitude !== undefined) {
+    device.currentLocation = {
+      latitude: latitude ?? device.currentLocation?.latitude,
+      longitude: longitude ?? device.currentLocation?.longitude,
+      address: address || device.currentLocation?.address
+    };
+  }
+
+  device.isOnline = true;
+  device.lastSeen = new Date();
+
+  await device.save();
+  return device;
+};
+
+module.exports = { applyDeviceStatus };
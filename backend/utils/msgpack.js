@@ -0,0 +1,34 @@
+const express = require('express');
+const { decode } = require('@msgpack/msgpack');
+
+// Express middleware: parses `application/msgpack` bodies into req.body.
+// @msgpack/msgpack rejects `__proto__` map keys, so a crafted body cannot
+// pollute Object.prototype through req.body.
+const msgpackParser = (options = {}) => {
+  const raw = express.raw({ ...options, type: 'application/msgpack' });
+
+  return (req, res, next) => {
+    raw(req, res, (err) => {
+      if (err) return next(err);
+      if (Buffer.isBuffer(req.body) && req.is('application/msgpack')) {
+        // Bodyless POSTs (e.g. heartbeats) parse to {} like express.json
+        if (req.body.length === 0) {
+          req.body = {};
+          return next();
+        }
+        try {
+          req.body = decode(req.body);
+        } catch (error) {
+          return res.status(400).json({
+            success: false,
+            message: 'Invalid MessagePack body',
+            error: error.message
+          });
+        }
+      }
+      next();
+    });
+  };
+};
+
+module.exports = { decode, msgpackParser };
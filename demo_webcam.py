@@ -11,16 +11,22 @@ Usage:
     python demo_webcam.py --server http://localhost:5000   (for local backend)
 
 Install dependencies:
-    pip install opencv-python python-socketio[client] requests
+    pip install opencv-python python-socketio[client] requests msgpack
+    pip install orjson          (optional, faster Socket.IO serialization)
+    pip install PyTurboJPEG     (optional, 2–4× faster JPEG encode; needs libturbojpeg)
+    pip install xxhash          (optional, faster static-scene detection)
 """
 
 import cv2
 import time
-import base64
+import zlib
 import random
 import argparse
 import threading
+import collections
+import concurrent.futures
 import requests
+from requests.adapters import HTTPAdapter
 
 try:
     import socketio
@@ -29,17 +35,68 @@ except ImportError:
     subprocess.check_call(['pip', 'install', 'python-socketio[client]'])
     import socketio
 
+try:
+    import msgpack
+except ImportError:
+    import subprocess
+    subprocess.check_call(['pip', 'install', 'msgpack'])
+    import msgpack
+
+# Optional: orjson serializes Socket.IO packets much faster than stdlib json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Optional: PyTurboJPEG encodes with libjpeg-turbo's SIMD (SSE2/AVX2/NEON) paths
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJSAMP_420
+    TURBOJPEG_AVAILABLE = True
+except ImportError:
+    TURBOJPEG_AVAILABLE = False
+
+# Optional: xxh3 (SIMD) for static-scene detection; zlib.crc32 is the fallback
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
 # ── Config ────────────────────────────────────────────────────────────────────
 DEVICE_ID   = 'DEMO-LAPTOP-001'
 FRAME_SKIP  = 3       # Send every Nth frame (~10 fps at 30fps camera)
 JPEG_QUALITY = 50     # 0–100 (lower = smaller file, faster)
+MAX_UNACKED  = 2      # Skip frames while more than this many emits await a server ack
+ACK_TIMEOUT  = 2.0    # Seconds before an unacknowledged emit is written off
+STATIC_RESEND_FRAMES = 30  # Re-send an unchanged scene at least this often (captured frames)
 # ──────────────────────────────────────────────────────────────────────────────
 
+# Overlay drawing constants (resolved once, not per frame)
+_FONT  = cv2.FONT_HERSHEY_SIMPLEX
+_GREEN = (0, 255, 0)
+_AMBER = (0, 220, 255)
+_GREY  = (200, 200, 200)
+_RED   = (0, 0, 255)
+_SEVERITY_COLORS = {'high': _RED, 'medium': (0, 165, 255), 'low': _GREEN}
+
 FAKE_DETECTION_TYPES = [
     'Severe Pothole', 'Asphalt Crack', 'Minor Pothole',
     'Manhole Depression', 'Surface Damage'
 ]
 
+class OrjsonCodec:
+    """stdlib-compatible ``json`` module for python-socketio, backed by orjson"""
+
+    @staticmethod
+    def dumps(obj, *args, **kwargs):
+        return orjson.dumps(obj).decode('utf-8')
+
+    @staticmethod
+    def loads(s, *args, **kwargs):
+        return orjson.loads(s)
+
+
 class WebcamDemo:
     def __init__(self, server_url, camera_index=0):
         self.server_url = server_url.rstrip('/')
@@ -47,9 +104,42 @@ class WebcamDemo:
         self.sio = None
         self.connected = False
         self.running = False
+        self._stop = threading.Event()
         self.frame_counter = 0
         self.fps = 0.0
 
+        # Per-frame constants, built once
+        self._jpeg_params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY,
+                             cv2.IMWRITE_JPEG_OPTIMIZE, 0]
+        self._stream_line = f'Streaming → {self.server_url}'
+        self._device_line = f'Device: {DEVICE_ID}'
+        self._fps_line = 'FPS: 0.0'
+        self._fps_line_value = 0.0
+        self._status_dot_pos = (640 - 20, 20)   # Updated from the real frame width in run()
+
+        # Static-scene suppression: hash of the last frame sent and when it went out
+        self._last_hash = None
+        self._last_sent_idx = 0
+
+        self.tj = None
+        if TURBOJPEG_AVAILABLE:
+            try:
+                self.tj = TurboJPEG()
+            except (OSError, RuntimeError) as e:
+                print(f'⚠️  libturbojpeg unavailable ({e}) — using cv2.imencode')
+
+        # HTTP fallback runs off the camera thread on a pooled keep-alive session
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.exec = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self.inflight = collections.deque(maxlen=4)
+
+        # Send times of Socket.IO emits still waiting for the server's ack
+        self._unacked = collections.deque()
+        self._ack_lock = threading.Lock()
+
     # ── Socket.IO connection ──────────────────────────────────────────────────
 
     def connect(self):
@@ -57,12 +147,15 @@ class WebcamDemo:
             reconnection=True,
             reconnection_attempts=0,   # infinite
             reconnection_delay=2,
-            reconnection_delay_max=10
+            reconnection_delay_max=10,
+            json=OrjsonCodec if ORJSON_AVAILABLE else None
         )
 
         @self.sio.event
         def connect():
             print(f'✅ Connected to backend: {self.server_url}')
+            with self._ack_lock:
+                self._unacked.clear()
             self.connected = True
             self.sio.emit('registerDevice', DEVICE_ID)
 
@@ -89,13 +182,10 @@ class WebcamDemo:
     def _keep_alive_loop(self):
         """Ping Render every 9 min so it doesn't sleep."""
         print('💓 Keep-alive thread started')
-        while self.running:
-            for _ in range(540):          # 9 minutes × 60 seconds
-                if not self.running:
-                    return
-                time.sleep(1)
+        while not self._stop.wait(540):   # 9 minutes, returns early on shutdown
             try:
-                r = requests.get(f'{self.server_url}/api/health', timeout=10)
+                # HEAD on the pooled session: reuses a warm connection, no body
+                r = self.session.head(f'{self.server_url}/api/health', timeout=10)
                 print(f'💓 Keep-alive ping → {r.status_code}')
             except Exception as e:
                 print(f'⚠️  Keep-alive failed: {e}')
@@ -103,8 +193,20 @@ class WebcamDemo:
     # ── Frame encoding ────────────────────────────────────────────────────────
 
     def encode_frame(self, frame):
-        _, buf = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
-        return base64.b64encode(buf).decode('utf-8')
+        """Encode frame to raw JPEG bytes (sent as a binary Socket.IO / msgpack payload)"""
+        if self.tj:
+            return self.tj.encode(frame, quality=JPEG_QUALITY,
+                                  pixel_format=TJPF_BGR, jpeg_subsample=TJSAMP_420)
+        _, buf = cv2.imencode('.jpg', frame, self._jpeg_params)
+        return buf.tobytes()
+
+    def _frame_hash(self, frame):
+        """Cheap fingerprint of a frame: 32×32 thumbnail with sensor-noise bits dropped"""
+        thumb = cv2.resize(frame, (32, 32), interpolation=cv2.INTER_AREA)
+        thumb >>= 4
+        if XXHASH_AVAILABLE:
+            return xxhash.xxh3_64_intdigest(thumb.data)
+        return zlib.crc32(thumb.data)
 
     # ── Fake detections (random, for demo only) ───────────────────────────────
 
@@ -128,13 +230,13 @@ class WebcamDemo:
 
     def _draw_overlay(self, frame, detections, fps):
         h, w = frame.shape[:2]
-        # FPS counter
-        cv2.putText(frame, f'FPS: {fps:.1f}', (10, 28),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-        cv2.putText(frame, f'Streaming → {self.server_url}', (10, 56),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 220, 255), 1)
-        cv2.putText(frame, f'Device: {DEVICE_ID}', (10, 78),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
+        # FPS counter (label only rebuilt when the value changes, ~once per second)
+        if fps != self._fps_line_value:
+            self._fps_line = f'FPS: {fps:.1f}'
+            self._fps_line_value = fps
+        cv2.putText(frame, self._fps_line, (10, 28), _FONT, 0.8, _GREEN, 2)
+        cv2.putText(frame, self._stream_line, (10, 56), _FONT, 0.5, _AMBER, 1)
+        cv2.putText(frame, self._device_line, (10, 78), _FONT, 0.5, _GREY, 1)
         # Draw fake bounding boxes
         for det in detections:
             bb = det['boundingBox']
@@ -142,33 +244,58 @@ class WebcamDemo:
             y1 = int(bb['y'] / 100 * h)
             x2 = x1 + int(bb['width'] / 100 * w)
             y2 = y1 + int(bb['height'] / 100 * h)
-            color = (0, 0, 255) if det['severity'] == 'high' else \
-                    (0, 165, 255) if det['severity'] == 'medium' else (0, 255, 0)
+            color = _SEVERITY_COLORS.get(det['severity'], _GREEN)
             cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
             label = f"{det['type']} {det['confidence']}%"
-            cv2.putText(frame, label, (x1, y1 - 8),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+            cv2.putText(frame, label, (x1, y1 - 8), _FONT, 0.5, color, 2)
         # Status dot
-        dot_color = (0, 255, 0) if self.connected else (0, 0, 255)
-        cv2.circle(frame, (w - 20, 20), 8, dot_color, -1)
+        cv2.circle(frame, self._status_dot_pos, 8, _GREEN if self.connected else _RED, -1)
         return frame
 
     # ── Send frame to backend ─────────────────────────────────────────────────
 
+    def _ack_cb(self, *args):
+        with self._ack_lock:
+            if self._unacked:
+                self._unacked.popleft()
+
     def _send_frame(self, payload):
-        # Primary: WebSocket
+        """Send a frame; returns False if it was dropped for backpressure.
+
+        The transport follows the connection state (WebSocket while connected,
+        HTTP otherwise) instead of being retried per frame on emit errors.
+        """
         if self.connected and self.sio:
+            now = time.monotonic()
+            with self._ack_lock:
+                while self._unacked and now - self._unacked[0] > ACK_TIMEOUT:
+                    self._unacked.popleft()
+                if len(self._unacked) > MAX_UNACKED:
+                    return False   # Uplink is behind — drop this frame
+                self._unacked.append(now)
             try:
-                self.sio.emit('liveStream', payload)
-                return
+                self.sio.emit('liveStream', payload, callback=self._ack_cb)
+                return True
             except Exception as e:
-                print(f'❌ Socket emit failed: {e} — falling back to HTTP')
-        # Fallback: HTTP POST
-        try:
-            requests.post(f'{self.server_url}/api/live/stream',
-                          json=payload, timeout=3)
-        except Exception:
-            pass   # Don't block the camera loop
+                print(f'❌ Socket emit failed: {e} — dropping frame')
+                with self._ack_lock:
+                    if self._unacked:
+                        self._unacked.pop()
+                return False
+
+        # Fallback: HTTP POST (MessagePack body — no repeated JSON field names),
+        # submitted to a worker so a slow uplink never stalls the camera loop
+        while self.inflight and self.inflight[0].done():
+            self.inflight.popleft()
+        if len(self.inflight) == self.inflight.maxlen:
+            # Backpressure: shed the oldest queued frame instead of piling up
+            self.inflight.popleft().cancel()
+        self.inflight.append(self.exec.submit(
+            self.session.post, f'{self.server_url}/api/live/stream',
+            data=msgpack.packb(payload, use_bin_type=True),
+            headers={'Content-Type': 'application/msgpack'},
+            timeout=3))
+        return True
 
     # ── Main loop ─────────────────────────────────────────────────────────────
 
@@ -178,19 +305,26 @@ class WebcamDemo:
             print(f'❌ Cannot open camera index {self.camera_index}')
             return
 
+        # Ask for MJPEG so USB cameras deliver 640×480@30 without YUYV bandwidth limits
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
         cap.set(cv2.CAP_PROP_FPS, 30)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640
+        self._status_dot_pos = (width - 20, 20)
         print(f'📷 Camera {self.camera_index} opened (640×480)')
 
         self.connect()
         self.running = True
 
         # Keep-alive thread
-        threading.Thread(target=self._keep_alive_loop, daemon=True).start()
+        keepalive = threading.Thread(target=self._keep_alive_loop, daemon=True)
+        keepalive.start()
 
-        fps_t0 = time.time()
+        fps_t0 = time.monotonic_ns()
         fps_count = 0
+        ts_second = 0       # Wall-clock second the cached timestamp string belongs to
+        ts_str = ''
         frame_idx = 0
         total_sent = 0
 
@@ -207,33 +341,49 @@ class WebcamDemo:
 
             # FPS calculation
             fps_count += 1
-            elapsed = time.time() - fps_t0
-            if elapsed >= 1.0:
-                self.fps = fps_count / elapsed
+            now_ns = time.monotonic_ns()
+            elapsed_ns = now_ns - fps_t0
+            if elapsed_ns >= 1_000_000_000:
+                self.fps = fps_count * 1e9 / elapsed_ns
                 fps_count = 0
-                fps_t0 = time.time()
+                fps_t0 = now_ns
 
             # Generate fake detections for demo
             detections = self._fake_detections()
 
-            # Draw overlay on local preview
-            preview = self._draw_overlay(frame.copy(), detections, self.fps)
-            cv2.imshow('Demo Webcam — press Q to quit', preview)
+            # Rate-limit: only send every Nth frame. Encode it before the
+            # overlay is drawn so the preview can reuse the frame without a copy
+            # (camera already delivers 640×480 — no resize needed)
+            send_frame = frame_idx % FRAME_SKIP == 0
+            if send_frame:
+                # Skip re-sending an unchanged scene (e.g. parked car) unless it
+                # has detections or the periodic refresh is due
+                frame_hash = self._frame_hash(frame)
+                if (not detections and frame_hash == self._last_hash and
+                        frame_idx - self._last_sent_idx < STATIC_RESEND_FRAMES):
+                    send_frame = False
+            if send_frame:
+                frame_jpeg = self.encode_frame(frame)
+
+            # Draw overlay on local preview (in place)
+            self._draw_overlay(frame, detections, self.fps)
+            cv2.imshow('Demo Webcam — press Q to quit', frame)
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
 
-            # Rate-limit: only send every Nth frame
-            if frame_idx % FRAME_SKIP != 0:
+            if not send_frame:
                 continue
 
-            # Resize & encode
-            frame_small = cv2.resize(frame, (640, 480))
-            frame_b64 = self.encode_frame(frame_small)
+            # Timestamp has 1 s resolution — only reformat when the second changes
+            now_s = int(time.time())
+            if now_s != ts_second:
+                ts_second = now_s
+                ts_str = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(now_s))
 
             payload = {
                 'deviceId':   DEVICE_ID,
-                'timestamp':  time.strftime('%Y-%m-%dT%H:%M:%S'),
-                'frame':      frame_b64,
+                'timestamp':  ts_str,
+                'frame':      frame_jpeg,
                 'detections': detections,
                 'gps': {'latitude': 28.6139, 'longitude': 77.2090, 'speed': 0},
                 'stats': {
@@ -245,7 +395,10 @@ class WebcamDemo:
                 }
             }
 
-            self._send_frame(payload)
+            if not self._send_frame(payload):
+                continue
+            self._last_hash = frame_hash
+            self._last_sent_idx = frame_idx
             total_sent += 1
 
             if total_sent % 30 == 0:
@@ -256,8 +409,11 @@ class WebcamDemo:
 
         # Cleanup
         self.running = False
+        self._stop.set()
+        keepalive.join(timeout=1)
         cap.release()
         cv2.destroyAllWindows()
+        self.exec.shutdown(wait=False, cancel_futures=True)
         if self.sio and self.connected:
             self.sio.disconnect()
         print(f'\n✅ Done. Total frames sent: {total_sent}')
@@ -3,16 +3,20 @@ Pothole Detection Script for Jetson Nano
 Runs YOLOv8 model and sends live detection data to backend server
 
 Usage: python pth.py [--server SERVER_URL] [--device DEVICE_ID] [--camera CAMERA_INDEX]
+                     [--precision {fp16,int8}] [--calib CALIB_YAML] [--imgsz SIZE] [--dla]
 """
 
+import os
 import cv2
+import glob
 import time
 import json
-import base64
+import asyncio
 import argparse
+import functools
 import threading
 from datetime import datetime
-from queue import Queue
+from queue import Queue, SimpleQueue, Empty, Full
 
 try:
     from ultralytics import YOLO
@@ -22,6 +26,9 @@ except ImportError:
     subprocess.check_call(['pip', 'install', 'ultralytics'])
     from ultralytics import YOLO
 
+import numpy as np
+import torch
+
 try:
     import requests
 except ImportError:
@@ -30,6 +37,9 @@ except ImportError:
     subprocess.check_call(['pip', 'install', 'requests'])
     import requests
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 try:
     import socketio
 except ImportError:
@@ -38,6 +48,35 @@ except ImportError:
     subprocess.check_call(['pip', 'install', 'python-socketio[client]'])
     import socketio
 
+try:
+    import msgpack
+except ImportError:
+    print("Installing msgpack...")
+    import subprocess
+    subprocess.check_call(['pip', 'install', 'msgpack'])
+    import msgpack
+
+# Optional: httpx multiplexes concurrent uploads over one HTTP/2 connection (pip install httpx[http2])
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+# Optional: orjson serializes Socket.IO packets much faster than stdlib json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Optional: PyTurboJPEG encodes with libjpeg-turbo's SIMD (NEON) paths, 2-4x faster than cv2
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJSAMP_420
+    TURBOJPEG_AVAILABLE = True
+except ImportError:
+    TURBOJPEG_AVAILABLE = False
+
 # Try to import GPS library (optional)
 try:
     import serial
@@ -47,6 +86,29 @@ except ImportError:
     print("Warning: pyserial not installed. GPS will use mock data.")
 
 
+def parse_gprmc(sentence):
+    """Parse a $GPRMC sentence into (lat, lon, speed_kmh, valid).
+    
+    speed_kmh is None when the field is empty; valid is False for sentences
+    without an active fix or with malformed fields.
+    """
+    parts = sentence.split(',')
+    # Fields: 1 time, 2 status, 3-4 lat/N-S, 5-6 lon/E-W, 7 speed (knots)
+    if len(parts) < 8 or parts[2] != 'A' or len(parts[3]) < 4 or len(parts[5]) < 5:
+        return 0.0, 0.0, None, False
+    try:
+        lat = float(parts[3][:2]) + float(parts[3][2:]) / 60
+        lon = float(parts[5][:3]) + float(parts[5][3:]) / 60
+        speed = float(parts[7]) * 1.852 if parts[7] else None  # knots to km/h
+    except ValueError:
+        return 0.0, 0.0, None, False
+    if parts[4] == 'S':
+        lat = -lat
+    if parts[6] == 'W':
+        lon = -lon
+    return lat, lon, speed, True
+
+
 class GPSReader:
     """Read GPS data from serial port (NEO-6M module)"""
     
@@ -73,29 +135,20 @@ class GPSReader:
         while self.running and self.serial:
             try:
                 line = self.serial.readline().decode('ascii', errors='ignore')
-                if line.startswith('$GPGGA') or line.startswith('$GPRMC'):
+                # Only RMC carries position and speed together; GGA sentences are skipped
+                if line.startswith('$GPRMC'):
                     self._parse_nmea(line)
             except Exception as e:
                 pass
     
     def _parse_nmea(self, sentence):
         """Parse NMEA sentence for GPS coordinates"""
-        try:
-            parts = sentence.split(',')
-            if sentence.startswith('$GPRMC') and len(parts) >= 7:
-                if parts[2] == 'A':  # Valid fix
-                    lat = float(parts[3][:2]) + float(parts[3][2:]) / 60
-                    if parts[4] == 'S':
-                        lat = -lat
-                    lon = float(parts[5][:3]) + float(parts[5][3:]) / 60
-                    if parts[6] == 'W':
-                        lon = -lon
-                    self.latitude = lat
-                    self.longitude = lon
-                    if parts[7]:
-                        self.speed = float(parts[7]) * 1.852  # knots to km/h
-        except:
-            pass
+        lat, lon, speed, valid = parse_gprmc(sentence)
+        if valid:
+            self.latitude = lat
+            self.longitude = lon
+            if speed is not None:
+                self.speed = speed
     
     def get_location(self):
         return {
@@ -111,38 +164,108 @@ class GPSReader:
 
 
 class SystemMonitor:
-    """Monitor Jetson Nano system stats"""
+    """Monitor Jetson Nano system stats.
     
-    @staticmethod
-    def get_temperature():
+    A background thread samples once per second; the getters return the cached
+    values so the per-frame stream path does no file I/O.
+    """
+    
+    THERMAL_PATH = '/sys/devices/virtual/thermal/thermal_zone0/temp'
+    
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.cached = {'temp': 45.0, 'cpu': 50.0, 'mem': 40.0}  # Defaults until first sample
+        self._prev_idle = None
+        self._prev_total = None
+        self._stop = threading.Event()
+        # Opened once and re-read with pread (offset 0) on every sample
+        self._fds = {}
+        for name, path in (('temp', self.THERMAL_PATH), ('cpu', '/proc/stat'), ('mem', '/proc/meminfo')):
+            try:
+                self._fds[name] = os.open(path, os.O_RDONLY)
+            except OSError:
+                pass
+        
+    def start(self):
+        self._sample()
+        threading.Thread(target=self._sample_loop, daemon=True).start()
+    
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+    
+    def _read(self, name, size=4096):
+        return os.pread(self._fds[name], size, 0).decode('ascii', errors='ignore')
+    
+    def _sample(self):
+        cached = dict(self.cached)
+        try:
+            cached['temp'] = int(self._read('temp', 32)) / 1000.0
+        except (KeyError, OSError, ValueError):
+            pass
+        try:
+            # First line: cpu user nice system idle iowait irq softirq steal ...
+            parts = self._read('cpu', 256).split('\n', 1)[0].split()
+            idle = int(parts[4]) + int(parts[5])
+            total = sum(int(p) for p in parts[1:])
+            if self._prev_total is not None and total > self._prev_total:
+                busy = 1 - (idle - self._prev_idle) / (total - self._prev_total)
+                cached['cpu'] = round(busy * 100, 1)
+            self._prev_idle, self._prev_total = idle, total
+        except (KeyError, OSError, ValueError, IndexError):
+            pass
         try:
-            with open('/sys/devices/virtual/thermal/thermal_zone0/temp', 'r') as f:
-                return int(f.read()) / 1000.0
-        except:
-            return 45.0  # Default temp
+            lines = self._read('mem', 512).split('\n')
+            total = int(lines[0].split()[1])
+            available = int(lines[2].split()[1])
+            cached['mem'] = round((1 - available/total) * 100, 1)
+        except (KeyError, OSError, ValueError, IndexError):
+            pass
+        self.cached = cached  # Single reference swap, safe to read from other threads
+    
+    def get_temperature(self):
+        return self.cached['temp']
+    
+    def get_cpu_usage(self):
+        return self.cached['cpu']
+    
+    def get_memory_usage(self):
+        return self.cached['mem']
+    
+    def stop(self):
+        self._stop.set()
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds = {}
+
+
+class OrjsonCodec:
+    """stdlib-compatible ``json`` module for python-socketio, backed by orjson"""
     
     @staticmethod
-    def get_cpu_usage():
-        try:
-            with open('/proc/stat', 'r') as f:
-                line = f.readline()
-                parts = line.split()
-                idle = float(parts[4])
-                total = sum(float(p) for p in parts[1:])
-                return round((1 - idle/total) * 100, 1)
-        except:
-            return 50.0
+    def dumps(obj, *args, **kwargs):
+        return orjson.dumps(obj).decode('utf-8')
     
     @staticmethod
-    def get_memory_usage():
-        try:
-            with open('/proc/meminfo', 'r') as f:
-                lines = f.readlines()
-                total = int(lines[0].split()[1])
-                available = int(lines[2].split()[1])
-                return round((1 - available/total) * 100, 1)
-        except:
-            return 40.0
+    def loads(s, *args, **kwargs):
+        return orjson.loads(s)
+
+
+# Max detections sent per /api/batch request
+DETECTION_BATCH_SIZE = 32
+# Max concurrent HTTP uploads on the async sender loop
+MAX_INFLIGHT_POSTS = 8
+# Detection queue fill level above which low/medium-severity records are dropped
+DETECTION_SHED_FILL = 0.8
+# Capture buffers preallocated for reuse; covers every frame the pipeline can hold at once
+CAPTURE_BUFFERS = 8
+
+# Jetson CSI camera (e.g. IMX219) capture pipeline, used with --csi
+CSI_PIPELINE = (
+    'nvarguscamerasrc ! video/x-raw(memory:NVMM),width=640,height=480,framerate=30/1 ! '
+    'nvvidconv ! video/x-raw,format=BGRx ! videoconvert ! video/x-raw,format=BGR ! '
+    'appsink drop=1 max-buffers=1'
+)
 
 
 class PotholeDetector:
@@ -161,15 +284,30 @@ class PotholeDetector:
         'crack': 'Asphalt Crack',
         'damage': 'Surface Damage'
     }
+    _TYPES_BY_ID = {k: v for k, v in DETECTION_TYPES.items() if isinstance(k, int)}
+    _TYPES_BY_NAME = {k: v for k, v in DETECTION_TYPES.items() if isinstance(k, str)}
+    
+    # Severity codes index both tuples: 0=low, 1=medium, 2=high
+    _SEVERITY = ('low', 'medium', 'high')
+    _COLOR = ((0, 255, 0), (0, 165, 255), (0, 0, 255))  # BGR
     
-    def __init__(self, model_path, server_url, device_id, camera_index=0):
+    def __init__(self, model_path, server_url, device_id, camera_index=0,
+                 precision='fp16', calib_data='calib.yaml', csi=False, imgsz=640, use_dla=False,
+                 headless=False):
         self.model_path = model_path
+        self.precision = precision
+        self.calib_data = calib_data
+        self.imgsz = imgsz
+        self.use_dla = use_dla
+        self.headless = headless
         self.server_url = server_url.rstrip('/')
         self.device_id = device_id
         self.camera_index = camera_index
+        self.csi = csi
         
         # Initialize components
         self.model = None
+        self.dla_models = []  # Extra engines on the DLA cores (Xavier/Orin, --dla)
         self.cap = None
         self.sio = None
         self.gps = GPSReader()
@@ -177,45 +315,166 @@ class PotholeDetector:
         
         # State
         self.running = False
+        self._stop = threading.Event()
         self.connected = False
         self.detection_count = 0
         self.frame_count = 0
         self.fps = 0
         self.last_fps_time = time.time()
-        self.frame_send_counter = 0  # Track frames to rate-limit sending
+        self.stream_interval = 1.0 / 8.0  # Stream ~8fps to the dashboard, independent of inference rate
+        self.last_stream_t = 0
+        self.status_interval = 5  # Fold device status into a stream frame every 5 seconds
+        self.last_status_t = 0
+        
+        self.tj = None
+        if TURBOJPEG_AVAILABLE:
+            try:
+                self.tj = TurboJPEG()
+            except (OSError, RuntimeError) as e:
+                print(f"Warning: libturbojpeg unavailable ({e}). Using cv2.imencode.")
+        
+        # Pooled keep-alive HTTP session: one TLS handshake instead of one per request
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4,
+                              max_retries=Retry(total=3, backoff_factor=0.3))
+        self.http.mount('http://', adapter)
+        self.http.mount('https://', adapter)
+        # Stream fallback frames are disposable: never retry (a newer frame is
+        # already waiting), so a dead uplink costs one timeout per frame at most.
+        # requests picks the longest matching mount prefix.
+        self.http.mount(f"{self.server_url}/api/live/stream",
+                        HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0))
+        
+        # Async sender loop for detection/status uploads (started in run())
+        self._aio_loop = None
+        self._aclient = None
+        # Taken by the detection sender before it drains a batch, released when the
+        # upload finishes: while all are busy, detections wait (and coalesce) in the queue
+        self._upload_slots = threading.BoundedSemaphore(MAX_INFLIGHT_POSTS)
         
         # Queue for detections
         self.detection_queue = Queue(maxsize=100)
         
+        # Pipeline stages: capture -> infer -> encode -> network
+        self.cap_q = Queue(maxsize=2)
+        self.det_q = Queue(maxsize=2)
+        self.send_q = Queue(maxsize=2)
+        self._threads = []
+        # Recycled capture buffers: cap.read() fills these instead of allocating each frame
+        self._free_bufs = SimpleQueue()  # Unbounded, single consumer: no locking needed
+        
+    @staticmethod
+    def dla_core_count():
+        """Number of DLA cores; 0 unless running on Xavier/Orin (the Nano has none)"""
+        try:
+            with open('/proc/device-tree/compatible', 'rb') as f:
+                compatible = f.read().lower()
+        except OSError:
+            return 0
+        if not any(soc in compatible for soc in (b'xavier', b'orin', b'tegra194', b'tegra234')):
+            return 0
+        return len(glob.glob('/dev/nvhost-nvdla[0-9]'))
+    
+    def export_engine(self, dla_core=None):
+        """Build a TensorRT engine next to the .pt weights (first run only, takes minutes on Jetson)"""
+        # Static engines are built for one input size, so it is part of the file name
+        suffix = f"_dla{dla_core}" if dla_core is not None else ""
+        engine_path = f"{os.path.splitext(self.model_path)[0]}_{self.precision}_{self.imgsz}{suffix}.engine"
+        if os.path.exists(engine_path):
+            return engine_path
+        
+        target = f" for DLA core {dla_core}" if dla_core is not None else ""
+        print(f"Exporting TensorRT {self.precision.upper()} engine{target} (one-time, please wait)...")
+        export_args = dict(format='engine', half=True, dynamic=False, simplify=True,
+                           imgsz=self.imgsz, workspace=2, batch=1)
+        if self.precision == 'int8':
+            # INT8 calibrates on ~100-500 representative road frames listed in the dataset yaml
+            export_args.update(int8=True, data=self.calib_data)
+        if dla_core is not None:
+            # Layers the DLA can't run fall back to the GPU
+            export_args['device'] = f"dla:{dla_core}"
+        exported = YOLO(self.model_path).export(**export_args)
+        # Ultralytics writes <name>.engine; keep one file per precision/device
+        os.replace(exported, engine_path)
+        return engine_path
+    
+    def load_dla_models(self):
+        """Load one engine per DLA core; each runs in its own inference thread next to the GPU"""
+        cores = self.dla_core_count()
+        if not cores:
+            print("No DLA cores found (Xavier/Orin only). Running on the GPU alone.")
+            return
+        dummy = np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)
+        for core in range(cores):
+            try:
+                model = YOLO(self.export_engine(dla_core=core), task='detect')
+                model(dummy, **self.infer_args)
+                self.dla_models.append(model)
+                print(f"DLA core {core} ready")
+            except Exception as e:
+                print(f"DLA core {core} unavailable: {e}")
+    
     def load_model(self):
-        """Load YOLOv8 model"""
-        print(f"Loading model: {self.model_path}")
+        """Load YOLOv8 model, converting .pt weights to a TensorRT engine on CUDA devices"""
+        model_path = self.model_path
+        if model_path.endswith('.pt') and torch.cuda.is_available():
+            try:
+                model_path = self.export_engine()
+            except Exception as e:
+                print(f"TensorRT export failed: {e}. Falling back to PyTorch weights.")
+                model_path = self.model_path
+        
+        # FP16 halves memory traffic on Jetson; ignored for CPU and prebuilt engines
+        self.infer_args = dict(verbose=False, conf=0.5, half=True, imgsz=self.imgsz)
+        if torch.cuda.is_available():
+            self.infer_args['device'] = 0
+        
+        print(f"Loading model: {model_path}")
         try:
-            self.model = YOLO(self.model_path)
-            # Warm up model
+            self.model = YOLO(model_path, task='detect')
+            if model_path.endswith('.pt'):
+                self.model.fuse()  # Fold BatchNorm into Conv weights
+            # Warm up model (first inferences trigger CUDA/TensorRT kernel autotuning)
             print("Warming up model...")
-            dummy = cv2.imread(self.model_path.replace('.pt', '_dummy.jpg')) if False else None
-            if dummy is None:
-                dummy = (255 * cv2.resize(cv2.UMat(480, 640, cv2.CV_8UC3), (640, 480))).get() if hasattr(cv2, 'UMat') else None
+            dummy = np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)
+            for _ in range(3):
+                self.model(dummy, **self.infer_args)
             print("Model loaded successfully!")
-            return True
         except Exception as e:
             print(f"Error loading model: {e}")
             return False
+        
+        if self.use_dla and self.model_path.endswith('.pt') and torch.cuda.is_available():
+            self.load_dla_models()
+        return True
     
     def init_camera(self):
         """Initialize camera capture"""
-        print(f"Initializing camera {self.camera_index}...")
-        self.cap = cv2.VideoCapture(self.camera_index)
+        if self.csi:
+            # Jetson CSI camera: debayer/scale on the ISP, keep only the newest frame in appsink
+            print("Initializing CSI camera (GStreamer)...")
+            self.cap = cv2.VideoCapture(CSI_PIPELINE, cv2.CAP_GSTREAMER)
+        else:
+            print(f"Initializing camera {self.camera_index}...")
+            self.cap = cv2.VideoCapture(self.camera_index)
         
         if not self.cap.isOpened():
             print("Error: Could not open camera")
             return False
         
-        # Set camera properties
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        self.cap.set(cv2.CAP_PROP_FPS, 30)
+        if not self.csi:
+            # Keep a single buffered frame so inference always sees the latest scene
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            # MJPG must be requested before the resolution; raw YUYV is USB bandwidth capped
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            self.cap.set(cv2.CAP_PROP_FPS, 30)
+        
+        width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640
+        height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 480
+        for _ in range(CAPTURE_BUFFERS):
+            self._free_bufs.put(np.empty((height, width, 3), dtype=np.uint8))
         
         print("Camera initialized successfully!")
         return True
@@ -228,7 +487,8 @@ class PotholeDetector:
             reconnection=True,
             reconnection_attempts=0,  # Infinite
             reconnection_delay=1,
-            reconnection_delay_max=5
+            reconnection_delay_max=5,
+            json=OrjsonCodec if ORJSON_AVAILABLE else None
         )
         
         @self.sio.event
@@ -254,110 +514,179 @@ class PotholeDetector:
             print("Will use HTTP fallback for detections")
             return False
     
-    def get_severity(self, confidence, area):
-        """Determine severity based on confidence and detection area"""
-        if confidence >= 0.85 or area > 0.1:
-            return 'high'
-        elif confidence >= 0.65 or area > 0.05:
-            return 'medium'
-        else:
-            return 'low'
+    def get_severity(self, confidences, areas):
+        """Severity codes (index into _SEVERITY) for arrays of confidences and normalized areas"""
+        return np.where((confidences >= 0.85) | (areas > 0.1), 2,
+                        np.where((confidences >= 0.65) | (areas > 0.05), 1, 0))
     
     def get_detection_type(self, class_id, class_name):
         """Get human-readable detection type"""
-        if class_id in self.DETECTION_TYPES:
-            return self.DETECTION_TYPES[class_id]
-        if class_name and class_name.lower() in self.DETECTION_TYPES:
-            return self.DETECTION_TYPES[class_name.lower()]
-        return 'Surface Damage'
+        return self._TYPES_BY_ID.get(class_id) or \
+            self._TYPES_BY_NAME.get((class_name or '').lower(), 'Surface Damage')
     
     def encode_frame(self, frame, quality=50):
-        """Encode frame to base64 JPEG"""
+        """Encode frame to raw JPEG bytes (sent as a binary Socket.IO / msgpack payload)"""
+        if self.tj:
+            return self.tj.encode(frame, quality=quality,
+                                  pixel_format=TJPF_BGR, jpeg_subsample=TJSAMP_420)
         _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
-        return base64.b64encode(buffer).decode('utf-8')
+        return buffer.tobytes()
     
-    def process_frame(self, frame):
-        """Run detection on frame"""
-        results = self.model(frame, verbose=False, conf=0.5)
+    def process_frame(self, frame, model=None):
+        """Run detection on frame (with the GPU model unless another engine is given)"""
+        results = (model or self.model)(frame, **self.infer_args)
         detections = []
         
         height, width = frame.shape[:2]
         
+        # float64 so the rounded percentages serialize cleanly (float32 rounding leaves 41.70000076)
+        wh = np.array([width, height], dtype=np.float64)
+        
         for result in results:
             boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    # Get box coordinates
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    confidence = float(box.conf[0])
-                    class_id = int(box.cls[0])
-                    class_name = result.names.get(class_id, 'pothole')
-                    
-                    # Calculate normalized coordinates
-                    x_norm = x1 / width
-                    y_norm = y1 / height
-                    w_norm = (x2 - x1) / width
-                    h_norm = (y2 - y1) / height
-                    area = w_norm * h_norm
-                    
-                    detection = {
-                        'type': self.get_detection_type(class_id, class_name),
-                        'confidence': round(confidence * 100, 1),
-                        'severity': self.get_severity(confidence, area),
-                        'boundingBox': {
-                            'x': round(x_norm * 100, 1),
-                            'y': round(y_norm * 100, 1),
-                            'width': round(w_norm * 100, 1),
-                            'height': round(h_norm * 100, 1)
-                        },
-                        'raw': {
-                            'x1': int(x1), 'y1': int(y1),
-                            'x2': int(x2), 'y2': int(y2)
-                        }
+            if boxes is None or len(boxes) == 0:
+                continue
+            
+            # One device->host copy per tensor instead of per box and field
+            xyxy = boxes.xyxy.cpu().numpy()
+            confs = boxes.conf.cpu().numpy().astype(np.float64)
+            clss = boxes.cls.cpu().numpy().astype(np.int32)
+            
+            # Normalized coordinates
+            xy1 = xyxy[:, :2] / wh
+            wh_n = xyxy[:, 2:] / wh - xy1
+            areas = wh_n[:, 0] * wh_n[:, 1]
+            
+            severities = self.get_severity(confs, areas).tolist()
+            conf_pct = np.round(confs * 100, 1).tolist()
+            bbs = np.round(np.hstack((xy1, wh_n)) * 100, 1).tolist()
+            pts = xyxy.astype(np.int32).tolist()
+            
+            for (x1, y1, x2, y2), confidence, class_id, severity, conf_p, bb in zip(
+                    pts, confs.tolist(), clss.tolist(), severities, conf_pct, bbs):
+                class_name = result.names.get(class_id, 'pothole')
+                
+                detection = {
+                    'type': self.get_detection_type(class_id, class_name),
+                    'confidence': conf_p,
+                    'severity': self._SEVERITY[severity],
+                    'boundingBox': {
+                        'x': bb[0],
+                        'y': bb[1],
+                        'width': bb[2],
+                        'height': bb[3]
+                    },
+                    'raw': {
+                        'x1': x1, 'y1': y1,
+                        'x2': x2, 'y2': y2
                     }
-                    detections.append(detection)
-                    
-                    # Draw on frame
-                    color = (0, 0, 255) if detection['severity'] == 'high' else \
-                            (0, 165, 255) if detection['severity'] == 'medium' else (0, 255, 0)
-                    cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
-                    label = f"{detection['type']} {confidence:.0%}"
-                    cv2.putText(frame, label, (int(x1), int(y1)-10), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+                }
+                detections.append(detection)
+                
+                # Draw on frame
+                color = self._COLOR[severity]
+                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+                label = f"{detection['type']} {confidence:.0%}"
+                cv2.putText(frame, label, (x1, y1-10), 
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
         
         return frame, detections
     
-    def send_detection_http(self, detection_data):
-        """Send detection via HTTP POST"""
+    def start_sender_loop(self):
+        """Run an asyncio loop in a daemon thread so HTTP uploads overlap their round trips"""
+        self._aio_loop = asyncio.new_event_loop()
+        threading.Thread(target=self._aio_loop.run_forever, daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._aio_init(), self._aio_loop).result()
+    
+    async def _aio_init(self):
+        """Create loop-bound state; must run on the sender loop"""
+        if HTTPX_AVAILABLE:
+            try:
+                self._aclient = httpx.AsyncClient(
+                    http2=True,
+                    timeout=5,
+                    limits=httpx.Limits(max_keepalive_connections=MAX_INFLIGHT_POSTS)
+                )
+            except ImportError as e:  # http2=True needs the h2 package
+                print(f"HTTP/2 unavailable ({e}), using requests")
+    
+    async def _apost(self, path, payload, timeout=5):
+        """POST JSON from the sender loop (callers bound concurrency via _upload_slots)"""
+        url = f"{self.server_url}{path}"
         try:
-            response = requests.post(
-                f"{self.server_url}/api/detections",
-                json=detection_data,
-                timeout=5
-            )
+            if self._aclient:
+                response = await self._aclient.post(url, json=payload, timeout=timeout)
+            else:
+                # No httpx: run the pooled requests session on the loop's thread pool
+                response = await self._aio_loop.run_in_executor(
+                    None, functools.partial(self.http.post, url, json=payload, timeout=timeout))
             return response.status_code == 201
         except Exception as e:
             print(f"HTTP send failed: {e}")
             return False
     
-    def send_live_data(self, frame, detections, gps_data):
-        """Send live detection data to backend — ALWAYS sends frames (not just on detections)"""
-        # Rate-limit: send every 3rd frame (~10fps) to save bandwidth on free tier
-        # But ALWAYS stream — even with zero detections
-        self.frame_send_counter += 1
-        if self.frame_send_counter % 3 != 0:
-            return  # Skip this frame, but next one will go through
-        
+    def _submit(self, path, payload, **kwargs):
+        """Schedule a POST on the sender loop from any thread; returns a concurrent Future"""
+        return asyncio.run_coroutine_threadsafe(self._apost(path, payload, **kwargs), self._aio_loop)
+    
+    def send_detections_http(self, detections):
+        """Send a batch of detections via HTTP POST (non-blocking)"""
+        return self._submit('/api/batch', {'deviceId': self.device_id, 'detections': detections})
+    
+    def build_stream_payload(self, frame, detections, gps_data):
+        """Queue detection records for upload and build the live stream payload
+        (frames stream with or without detections). Returns None for frames
+        skipped by the stream rate limit; sending is up to the network thread."""
         timestamp = datetime.now().isoformat()
         
-        # Resize frame to ensure consistent size (640x480)
-        frame_resized = cv2.resize(frame, (640, 480))
+        # Every detection is recorded, whether or not its frame gets streamed
+        for det in detections:
+            self.detection_count += 1
+            # Uploads are capped at MAX_INFLIGHT_POSTS, so a slow server backs records up
+            # in detection_queue; near capacity only high-severity records get in
+            if (self.detection_queue.qsize() >= self.detection_queue.maxsize * DETECTION_SHED_FILL
+                    and det['severity'] != 'high'):
+                continue
+            detection_record = {
+                'deviceId': self.device_id,
+                'type': det['type'],
+                'severity': det['severity'],
+                'confidence': det['confidence'],
+                'location': f"GPS: {gps_data['latitude']:.4f}, {gps_data['longitude']:.4f}",
+                'latitude': gps_data['latitude'],
+                'longitude': gps_data['longitude'],
+                'boundingBox': det['boundingBox'],
+                'timestamp': timestamp
+            }
+            
+            # Queue for async sending
+            if not self.detection_queue.full():
+                self.detection_queue.put(detection_record)
+        
+        # Rate-limit by time: the dashboard can't use 30fps of JPEGs, so skip the
+        # resize/encode for frames inside the window. Frames with detections always go out.
+        now = time.time()
+        if now - self.last_stream_t < self.stream_interval and not detections:
+            return None
+        self.last_stream_t = now
+        
+        # Back off when the websocket can't keep up: lower quality, then drop frames
+        backlog = self.transport_backlog()
+        if backlog > 8:
+            return None
+        quality = 50 if backlog < 2 else 30 if backlog < 5 else 15
+        
+        # Resize frame to ensure consistent size (640x480); the camera normally delivers it already
+        if frame.shape[:2] == (480, 640):
+            frame_resized = frame
+        else:
+            frame_resized = cv2.resize(frame, (640, 480))
         
         # Prepare live stream data with optimized quality
         stream_data = {
             'deviceId': self.device_id,
             'timestamp': timestamp,
-            'frame': self.encode_frame(frame_resized, quality=50),
+            'frame': self.encode_frame(frame_resized, quality=quality),
             'detections': detections,  # [] when no pothole — that's fine, frame still streams
             'gps': gps_data,
             'stats': {
@@ -369,54 +698,51 @@ class PotholeDetector:
             }
         }
         
+        # Piggyback device status instead of a separate Socket.IO event + HTTP POST.
+        # Keep attaching it until a payload carrying it is actually sent (the
+        # network thread advances last_status_t) — send_q may drop this one.
+        if now - self.last_status_t >= self.status_interval:
+            stream_data['status'] = self.build_status(gps_data)
+        
+        return stream_data
+    
+    def transport_backlog(self):
+        """Packets waiting in the Engine.IO send queue (each binary emit queues two)"""
+        queue = getattr(self.sio.eio, 'queue', None) if self.connected and self.sio else None
+        return queue.qsize() if queue is not None else 0
+    
+    def send_stream(self, stream_data):
+        """Push a live stream payload to the backend; returns True once it is sent"""
         # Primary: Send via Socket.IO (WebSocket) if connected
         if self.connected and self.sio:
             try:
                 self.sio.emit('liveStream', stream_data)
+                return True
             except Exception as e:
                 print(f"❌ Socket emit failed: {e}")
                 # Fallback to HTTP if socket fails
-                self._send_http_stream(stream_data)
+                return self._send_http_stream(stream_data)
         else:
             # Fallback: send via HTTP POST when WebSocket is disconnected
-            self._send_http_stream(stream_data)
-        
-        # For each new detection, also send via HTTP for database storage
-        for det in detections:
-            self.detection_count += 1
-            detection_record = {
-                'deviceId': self.device_id,
-                'type': det['type'],
-                'severity': det['severity'],
-                'confidence': det['confidence'],
-                'location': f"GPS: {gps_data['latitude']:.4f}, {gps_data['longitude']:.4f}",
-                'latitude': gps_data['latitude'],
-                'longitude': gps_data['longitude'],
-                'boundingBox': det['boundingBox'],
-                'timestamp': timestamp
-            }
-            
-            # Queue for async sending
-            if not self.detection_queue.full():
-                self.detection_queue.put(detection_record)
+            return self._send_http_stream(stream_data)
     
     def _send_http_stream(self, stream_data):
         """HTTP fallback: POST frame to backend when WebSocket is unavailable"""
         try:
-            requests.post(
+            # JSON cannot carry the binary frame; the backend accepts MessagePack bodies
+            response = self.http.post(
                 f"{self.server_url}/api/live/stream",
-                json=stream_data,
+                data=msgpack.packb(stream_data, use_bin_type=True),
+                headers={'Content-Type': 'application/msgpack'},
                 timeout=3
             )
+            return response.ok
         except Exception as e:
-            pass  # Silently skip — don't block main loop
+            return False  # Silently skip — don't block main loop
     
-    def send_device_status(self):
-        """Send periodic device status update"""
-        gps_data = self.gps.get_location()
-        
-        status_data = {
-            'deviceId': self.device_id,
+    def build_status(self, gps_data):
+        """Device status record, sent along with a stream frame every status_interval seconds"""
+        return {
             'temperature': self.monitor.get_temperature(),
             'cpuUsage': self.monitor.get_cpu_usage(),
             'memoryUsage': self.monitor.get_memory_usage(),
@@ -429,52 +755,174 @@ class PotholeDetector:
             'vehicleSpeed': gps_data['speed'],
             'inferenceRate': self.fps
         }
-        
-        # Send via Socket.IO
-        if self.connected and self.sio:
-            self.sio.emit('deviceStatusUpdate', status_data)
-        
-        # Also send via HTTP
-        try:
-            requests.post(
-                f"{self.server_url}/api/devices/status",
-                json=status_data,
-                timeout=3
-            )
-        except:
-            pass
     
     def detection_sender_thread(self):
-        """Background thread to send detections via HTTP"""
+        """Background thread to send queued detections via HTTP, up to DETECTION_BATCH_SIZE per request"""
         while self.running:
+            # Wait for a free upload slot before draining, so a slow server backs
+            # detections up in the bounded queue instead of in unbounded pending tasks
+            if not self._upload_slots.acquire(timeout=0.5):
+                continue
+            # Sleep on the queue's condition variable; wakes as soon as a detection arrives
             try:
-                if not self.detection_queue.empty():
-                    detection = self.detection_queue.get(timeout=1)
-                    self.send_detection_http(detection)
-                else:
-                    time.sleep(0.1)
-            except:
-                pass
+                batch = [self.detection_queue.get(timeout=0.5)]
+            except Empty:
+                self._upload_slots.release()
+                continue
+            # Sweep up whatever else is already waiting
+            while len(batch) < DETECTION_BATCH_SIZE:
+                try:
+                    batch.append(self.detection_queue.get_nowait())
+                except Empty:
+                    break
+            future = self.send_detections_http(batch)
+            future.add_done_callback(functools.partial(self._upload_done, len(batch)))
+    
+    def _upload_done(self, count, future):
+        """Free the upload slot and mark the batch's records done once its POST finishes"""
+        self._upload_slots.release()
+        for _ in range(count):
+            self.detection_queue.task_done()
     
     def keep_alive_thread(self):
         """Ping backend every 9 minutes to prevent Render free tier from sleeping.
         Render sleeps after 15 minutes of no HTTP traffic — this prevents that."""
         print("🔄 Keep-alive thread started (pings Render every 9 minutes)")
-        while self.running:
-            # Wait 9 minutes (540 seconds)
-            for _ in range(540):
-                if not self.running:
-                    return
-                time.sleep(1)
+        # Wait 9 minutes (540 seconds); returns early as soon as cleanup() fires
+        while not self._stop.wait(540):
             # Ping the health endpoint
             try:
-                response = requests.get(f"{self.server_url}/api/health", timeout=10)
+                response = self.http.head(f"{self.server_url}/api/health", timeout=10)
                 print(f"💓 Keep-alive ping: {response.status_code} (Render stays awake)")
             except Exception as e:
                 print(f"⚠️  Keep-alive ping failed: {e}")
     
+    @staticmethod
+    def _put_latest(q, item, on_drop=None):
+        """Non-blocking put that drops the oldest item when the queue is full"""
+        while True:
+            try:
+                q.put_nowait(item)
+                return
+            except Full:
+                try:
+                    dropped = q.get_nowait()
+                    if on_drop:
+                        on_drop(dropped)
+                except Empty:
+                    pass
+    
+    def _get_buffer(self):
+        """Take a free capture buffer, or None (cap.read then allocates) if all are in the pipeline"""
+        try:
+            return self._free_bufs.get_nowait()
+        except Empty:
+            return None
+    
+    def _release_buffer(self, frame):
+        """Return a frame to the capture pool once no stage uses it anymore"""
+        self._free_bufs.put_nowait(frame)
+    
+    def capture_thread(self):
+        """Stage 1: grab frames as fast as the camera delivers them, keeping only the freshest"""
+        while self.running:
+            buf = self._get_buffer()
+            try:
+                # Fills buf in place when its shape matches, else returns a new array
+                ret, frame = self.cap.read(buf)
+            except Exception as e:
+                print(f"❌ Capture error: {e}")
+                ret = False
+            if not ret:
+                if buf is not None:
+                    self._release_buffer(buf)
+                print("Frame capture failed")
+                time.sleep(0.1)
+                continue
+            self._put_latest(self.cap_q, frame, on_drop=self._release_buffer)
+    
+    def publish_frame(self, processed_frame, detections):
+        """Count FPS and hand an inferred frame to the encoder (called by every inference thread)"""
+        # Calculate FPS
+        with self._fps_lock:
+            self._fps_frames += 1
+            elapsed = time.time() - self._fps_start
+            if elapsed >= 1.0:
+                self.fps = round(self._fps_frames / elapsed, 1)
+                self._fps_frames = 0
+                self._fps_start = time.time()
+        
+        # Get GPS data
+        gps_data = self.gps.get_location()
+        
+        # Hand off to the encoder; blocks (back-pressure) if encoding falls behind
+        # so detections are never dropped
+        while self.running:
+            try:
+                self.det_q.put((processed_frame, detections, gps_data), timeout=0.5)
+                break
+            except Full:
+                continue
+        
+        # Print status
+        if detections:
+            for det in detections:
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] "
+                      f"Detected: {det['type']} ({det['confidence']}%) - {det['severity'].upper()}")
+    
+    def dla_inference_thread(self, model):
+        """Stage 2 on a DLA core: takes frames from the same queue as the GPU loop"""
+        while self.running:
+            try:
+                frame = self.cap_q.get(timeout=0.5)
+            except Empty:
+                continue
+            # A failing frame must not kill the thread: the pipeline would stall
+            try:
+                processed_frame, detections = self.process_frame(frame, model)
+            except Exception as e:
+                print(f"❌ DLA inference error: {e}")
+                self._release_buffer(frame)
+                continue
+            self.publish_frame(processed_frame, detections)
+    
+    def encode_thread(self):
+        """Stage 3: resize, JPEG-encode and package frames for streaming"""
+        while self.running:
+            try:
+                frame, detections, gps_data = self.det_q.get(timeout=0.5)
+            except Empty:
+                continue
+            # A failing frame must not kill the thread: inference would block
+            # forever on the full det_q
+            try:
+                stream_data = self.build_stream_payload(frame, detections, gps_data)
+            except Exception as e:
+                print(f"❌ Encode error: {e}")
+                stream_data = None
+            # The payload holds encoded bytes only, so the frame can be reused
+            self._release_buffer(frame)
+            if stream_data is not None:
+                self._put_latest(self.send_q, stream_data)
+    
+    def network_thread(self):
+        """Stage 4: emit stream payloads"""
+        while self.running:
+            try:
+                stream_data = self.send_q.get(timeout=0.5)
+            except Empty:
+                continue
+            try:
+                sent = self.send_stream(stream_data)
+            except Exception as e:
+                print(f"❌ Stream send error: {e}")
+                continue
+            if sent and 'status' in stream_data:
+                # Only now is the status delivered; encode_thread stops attaching it
+                self.last_status_t = time.time()
+    
     def run(self):
-        """Main detection loop"""
+        """Main detection loop (stage 2: inference and display)"""
         print("\n" + "="*60)
         print("  POTHOLE DETECTION SYSTEM - JETSON NANO")
         print("="*60)
@@ -486,73 +934,61 @@ class PotholeDetector:
             return
         
         self.gps.start()
+        self.monitor.start()
         self.connect_socket()
         
         self.running = True
         
+        self.start_sender_loop()
+        
+        self._fps_lock = threading.Lock()
+        self._fps_frames = 0
+        self._fps_start = time.time()
+        
         # Start background threads
-        sender_thread = threading.Thread(target=self.detection_sender_thread, daemon=True)
-        sender_thread.start()
+        for target in (self.capture_thread, self.encode_thread, self.network_thread,
+                       self.detection_sender_thread):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        
+        # DLA engines pull frames alongside the GPU loop below
+        for model in self.dla_models:
+            thread = threading.Thread(target=self.dla_inference_thread, args=(model,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
         
         # Start keep-alive thread to prevent Render from sleeping
         keepalive_thread = threading.Thread(target=self.keep_alive_thread, daemon=True)
         keepalive_thread.start()
         
-        status_interval = 5  # Send status every 5 seconds
-        last_status_time = time.time()
-        frame_count_for_fps = 0
-        fps_start_time = time.time()
-        
-        print("\nStarting detection loop... Press 'q' to quit\n")
+        quit_hint = "Ctrl+C" if self.headless else "'q'"
+        print(f"\nStarting detection loop... Press {quit_hint} to quit\n")
         
         try:
             while self.running:
-                ret, frame = self.cap.read()
-                if not ret:
-                    print("Frame capture failed")
-                    time.sleep(0.1)
+                try:
+                    frame = self.cap_q.get(timeout=0.5)
+                except Empty:
                     continue
                 
                 # Process frame
                 processed_frame, detections = self.process_frame(frame)
+                # Copy for display before the hand-off: once published, the encoder
+                # returns processed_frame to the capture pool and it gets overwritten
+                display_frame = None if self.headless else processed_frame.copy()
+                self.publish_frame(processed_frame, detections)
                 
-                # Calculate FPS
-                frame_count_for_fps += 1
-                elapsed = time.time() - fps_start_time
-                if elapsed >= 1.0:
-                    self.fps = round(frame_count_for_fps / elapsed, 1)
-                    frame_count_for_fps = 0
-                    fps_start_time = time.time()
-                
-                # Get GPS data
-                gps_data = self.gps.get_location()
-                
-                # Send live data
-                self.send_live_data(processed_frame, detections, gps_data)
-                
-                # Send status periodically
-                if time.time() - last_status_time >= status_interval:
-                    self.send_device_status()
-                    last_status_time = time.time()
-                
-                # Display frame (optional - disable on headless Jetson)
-                cv2.putText(processed_frame, f"FPS: {self.fps}", (10, 30), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                cv2.putText(processed_frame, f"Detections: {self.detection_count}", (10, 60), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                
-                try:
-                    cv2.imshow('Pothole Detection', processed_frame)
+                # Display frame (skipped entirely with --headless)
+                if display_frame is not None:
+                    cv2.putText(display_frame, f"FPS: {self.fps}", (10, 30), 
+                                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+                    cv2.putText(display_frame, f"Detections: {self.detection_count}", (10, 60), 
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                    
+                    cv2.imshow('Pothole Detection', display_frame)
                     if cv2.waitKey(1) & 0xFF == ord('q'):
                         break
-                except:
-                    pass  # No display available
-                
-                # Print status
-                if detections:
-                    for det in detections:
-                        print(f"[{datetime.now().strftime('%H:%M:%S')}] "
-                              f"Detected: {det['type']} ({det['confidence']}%) - {det['severity'].upper()}")
                 
         except KeyboardInterrupt:
             print("\nStopping...")
@@ -562,16 +998,31 @@ class PotholeDetector:
     def cleanup(self):
         """Cleanup resources"""
         self.running = False
+        self._stop.set()
         print("Cleaning up...")
         
+        # Let pipeline stages finish their current item (they poll with a 0.5s timeout)
+        for thread in self._threads:
+            thread.join(timeout=1)
+        
         if self.cap:
             self.cap.release()
         
         if self.sio and self.connected:
             self.sio.disconnect()
         
+        if self._aio_loop:
+            if self._aclient:
+                try:
+                    asyncio.run_coroutine_threadsafe(self._aclient.aclose(), self._aio_loop).result(timeout=2)
+                except Exception:
+                    pass
+            self._aio_loop.call_soon_threadsafe(self._aio_loop.stop)
+        
         self.gps.stop()
-        cv2.destroyAllWindows()
+        self.monitor.stop()
+        if not self.headless:
+            cv2.destroyAllWindows()
         
         print(f"Session ended. Total detections: {self.detection_count}")
 
@@ -586,10 +1037,24 @@ def main():
                         help='Device ID (default: JETSON-001)')
     parser.add_argument('--camera', type=int, default=0,
                         help='Camera index (default: 0)')
+    parser.add_argument('--csi', action='store_true',
+                        help='Use the Jetson CSI camera via GStreamer instead of --camera')
     parser.add_argument('--headless', action='store_true',
                         help='Run without display')
+    parser.add_argument('--precision', choices=['fp16', 'int8'], default='fp16',
+                        help='TensorRT engine precision when exporting .pt weights (default: fp16)')
+    parser.add_argument('--calib', type=str, default='calib.yaml',
+                        help='Dataset yaml with calibration images for INT8 export (default: calib.yaml)')
+    parser.add_argument('--imgsz', type=int, default=640,
+                        help='Inference size in pixels, a multiple of 32; 320 is ~4x cheaper on Jetson Nano (default: 640)')
+    parser.add_argument('--dla', action='store_true',
+                        help='Also run inference on the DLA cores (Jetson Xavier/Orin only)')
     
     args = parser.parse_args()
+    # ultralytics would silently round other sizes up to the model stride, so
+    # the exported engine's name would not match its real input size
+    if args.imgsz <= 0 or args.imgsz % 32 != 0:
+        parser.error(f"--imgsz must be a positive multiple of 32 (got {args.imgsz})")
     
     print(f"""
 ╔═══════════════════════════════════════════════════════════════╗
@@ -606,7 +1071,13 @@ def main():
         model_path=args.model,
         server_url=args.server,
         device_id=args.device,
-        camera_index=args.camera
+        camera_index=args.camera,
+        precision=args.precision,
+        calib_data=args.calib,
+        csi=args.csi,
+        imgsz=args.imgsz,
+        use_dla=args.dla,
+        headless=args.headless
     )
     
     detector.run()
@@ -83,7 +83,9 @@ class TestClient:
             def on_livestream(data):
                 self.frame_counter += 1
                 print(f"📹 [{self.frame_counter}] Received 'liveStream' event from Jetson: {data['deviceId']}")
-                print(f"    Frame size: {len(data.get('frame', ''))} chars")
+                frame = data.get('frame', '')
+                unit = 'bytes' if isinstance(frame, (bytes, bytearray)) else 'chars'
+                print(f"    Frame size: {len(frame)} {unit}")
                 print(f"    Detections: {len(data.get('detections', []))}")
                 print(f"    Stats: {data.get('stats', {})}")
         